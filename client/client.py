@@ -5,15 +5,48 @@ This file encapsulates a Client entity within the OLAF-Neighbourhood protocol.
 import sys
 import os
 
-sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "libs")))
+# The shared libs package sits beside this directory in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import argparse
+import logging
+import logging.handlers
+import queue
 import threading
-from crypto_utils import generate_private_key
+from collections import OrderedDict, deque
+from concurrent.futures import Future, wait
+from libs.crypto_utils import generate_private_key, get_fingerprint, get_public_key
 from client_events import Event
 from client_cli import ClientCLI
 from request import Request
 import socketio
 
+# Number of received messages kept for display before the oldest are dropped
+MAX_BUFFERED_MESSAGES = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging():
+    """
+    Configures client logging to be written by a background thread.
+
+    Socket and worker threads only put records on a queue, so writing to
+    the terminal never stalls message handling.
+
+    Returns:
+        QueueListener: The started listener writing queued records.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    return listener
+
 
 class Client:
     """
@@ -22,17 +55,23 @@ class Client:
     Attributes:
         host (str): The server host.
         port (int): The server port.
-        private_key (str-base64): The client's private key.
+        private_key: The client's RSA private key object.
+        keygen_thread (Thread): Background thread generating the key pair.
+        public_key (str-base64): The client's public key.
+        fingerprint (str): Fingerprint of the client's public key.
         nonce (int): A counter for unique requests.
-        user_list (dict): A dictionary to store users.
-        message_buffer (list): A list to buffer messages.
+        nonce_lock (Lock): Guards the nonce, which the CLI and socket threads
+            both use.
+        user_list (dict): A dictionary to store users' server addresses.
+        public_keys (dict): A dictionary to store users' public keys.
+        message_buffer (deque): A bounded buffer of received messages.
+        pending_responses (dict): Futures for server responses being awaited.
         event (Event): An instance of Event for handling events.
         request (Request): An instance of Request for making requests.
         socket_io: SocketIO client instance for communication.
     """
 
-    response_event = threading.Event()
-    request_types = ["public_chat", "chat", "file_upload", "file_download"]
+    request_types = ("public_chat", "chat", "file_upload", "file_download")
 
     def __init__(self, host, port):
         """
@@ -45,16 +84,24 @@ class Client:
         self.host = host
         self.port = port
 
-        # Private key of the client (str-base64)
-        self.private_key = generate_private_key()
+        # RSA key generation is slow, so it runs in the background while the
+        # connection to the server is established (see initialise)
+        self.private_key = None
+        self.public_key = None
+        self.fingerprint = None
+        self.keygen_thread = threading.Thread(target=self.generate_keys, daemon=True)
+        self.keygen_thread.start()
         # Nonce/counter for tracking messages, including secure communication sequences
         self.nonce = 1
-        # Map of public_key(str) to server_ip(str)
+        self.nonce_lock = threading.Lock()
+        # Map of fingerprint(str) to server_ip(str)
         self.user_list = {}
+        # Map of fingerprint(str) to public_key(str-base64)
+        self.public_keys = {}
         # Map of fingerprint(str) to counter/nonce(int)
         self.user_counter_map = {}
-        # List of received Msg objects
-        self.message_buffer = []
+        # Most recently received Msg objects, oldest are dropped when full
+        self.message_buffer = deque(maxlen=MAX_BUFFERED_MESSAGES)
         # Download URLs of uploaded files
         self.download_links = {}
 
@@ -63,8 +110,12 @@ class Client:
         self.request = Request(self)
         self.client_cli = ClientCLI(self)
 
-        # Track processed message IDs to prevent duplicates
-        self.processed_message_ids = set()
+        # Map of awaited server response event name(str) to Future
+        self.pending_responses = {}
+
+        # Track recently processed message IDs to prevent duplicates,
+        # insertion ordered so the oldest can be evicted
+        self.processed_message_ids = OrderedDict()
 
         # Create the web socket client and attach the relevant
         # listeners/handlers defined in the Event class
@@ -74,17 +125,70 @@ class Client:
         self.socket_io.on("client_list", self.event.client_list)
         self.socket_io.on("message", self.event.message)
 
+    def generate_keys(self):
+        """
+        Generates the client's key pair and derives the public key and
+        fingerprint, which never change for the session.
+        """
+        private_key = generate_private_key()
+        self.public_key = get_public_key(private_key)
+        self.fingerprint = get_fingerprint(self.public_key)
+        self.private_key = private_key
+
+    def next_counter(self):
+        """
+        Allocates the counter for the next signed message.
+
+        Returns:
+            str: A counter not used by any other message from this client.
+        """
+        with self.nonce_lock:
+            counter = self.nonce
+            self.nonce += 1
+        return str(counter)
+
+    def expect_response(self, event_name):
+        """
+        Registers interest in the next response of the given event type.
+
+        Args:
+            event_name (str): The name of the server event to wait for.
+
+        Returns:
+            Future: Completed when the event is received from the server.
+        """
+        future = Future()
+        self.pending_responses[event_name] = future
+        return future
+
+    def resolve_response(self, event_name):
+        """
+        Completes the pending Future for a received server event, if any.
+
+        Args:
+            event_name (str): The name of the server event received.
+        """
+        future = self.pending_responses.pop(event_name, None)
+        if future is not None:
+            future.set_result(None)
+
     def initialise(self):
         """
         Starts the initialization process for the client.
         Connects to the server and sends mandatory startup
         requests.
         """
-        print("!------Starting Initialisation Process------!")
+        logger.info("!------Starting Initialisation Process------!")
         self.request.connect()
-        self.request.hello()
-        self.request.client_list_request()
-        print("!------Initialisation Process Completed------!")
+        # The key pair is first needed to sign the hello message
+        self.keygen_thread.join()
+        threading.Thread(target=self.event.process_messages, daemon=True).start()
+        # The hello and client list requests are sent back to back and
+        # their responses awaited together
+        hello_response = self.request.hello()
+        client_list_response = self.request.client_list_request()
+        wait([hello_response, client_list_response])
+        logger.info("!------Initialisation Process Completed------!")
 
     def run(self):
         """
@@ -102,11 +206,17 @@ if __name__ == "__main__":
     parser.add_argument("--port", type=int, required=True, help="Port")
     args = parser.parse_args()
 
+    log_listener = configure_logging()
+
     SERVER_HOST = args.host
     if SERVER_HOST == "localhost":
         SERVER_HOST = "127.0.0.1"
         
     SERVER_PORT = args.port
-    client = Client(SERVER_HOST, SERVER_PORT)
-    client.initialise()
-    client.run()
+    try:
+        client = Client(SERVER_HOST, SERVER_PORT)
+        client.initialise()
+        client.run()
+    finally:
+        # Writes out any records still queued, such as an error just logged
+        log_listener.stop()
@@ -1,6 +1,115 @@
+import os
+import queue
+import re
+import threading
+import uuid
 import requests
 import subprocess
-from crypto_utils import get_public_key, get_fingerprint
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # Gives input() line editing and history where the platform supports it
+    import readline  # noqa: F401
+except ImportError:
+    pass
+
+# Bytes moved per read/write when transferring files
+CHUNK_SIZE = 1024 * 1024
+# Size of each byte range fetched by a parallel download worker
+DOWNLOAD_PART_SIZE = 2 * CHUNK_SIZE
+DOWNLOAD_WORKERS = 4
+# Errors that can end a download part way, raw reads raise urllib3's own
+DOWNLOAD_ERRORS = (
+    requests.exceptions.RequestException,
+    urllib3.exceptions.HTTPError,
+    OSError,
+)
+# Number of file chunks read ahead of the socket during an upload
+UPLOAD_READ_AHEAD = 4
+# Errors from reading an upload, ValueError if the file is closed mid-read
+READ_ERRORS = (OSError, ValueError)
+# Matches each index in a list of user selections, ignoring separators
+INDEX_PATTERN = re.compile(r"\d+")
+
+
+class MultipartFileStream:
+    """
+    A multipart/form-data request body that streams a single file.
+
+    requests sends an iterable with a known length chunk by chunk under a
+    Content-Length header. A reader thread keeps a few chunks read ahead, so
+    disk reads overlap with network writes while memory use stays bounded.
+    """
+
+    def __init__(self, file, field_name, chunk_size=CHUNK_SIZE):
+        """
+        Initialize the stream for an open binary file.
+
+        Args:
+            file: The file object opened in binary mode.
+            field_name (str): The form field name the server reads the file from.
+            chunk_size (int): The number of bytes read from the file at a time.
+        """
+        self.file = file
+        self.chunk_size = chunk_size
+        boundary = uuid.uuid4().hex
+        filename = os.path.basename(file.name).replace('"', "%22")
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        self.tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self.file_size = os.fstat(file.fileno()).st_size
+
+    def __len__(self):
+        return len(self.head) + self.file_size + len(self.tail)
+
+    def __iter__(self):
+        chunks = queue.Queue(maxsize=UPLOAD_READ_AHEAD)
+        stop = threading.Event()
+        reader = threading.Thread(
+            target=self.read_ahead, args=(chunks, stop), daemon=True
+        )
+        reader.start()
+        try:
+            yield self.head
+            while chunk := chunks.get():
+                if isinstance(chunk, READ_ERRORS):
+                    raise chunk
+                yield chunk
+            yield self.tail
+        finally:
+            # Stop the reader if the upload ends early so it never reads a closed file
+            stop.set()
+            reader.join()
+
+    def read_ahead(self, chunks, stop):
+        """
+        Reads the file into a queue until it is exhausted or stopped.
+
+        Args:
+            chunks (queue.Queue): Receives each chunk, then an empty chunk at
+                the end of the file or the error raised by a failed read.
+            stop (threading.Event): Set when the consumer stops reading.
+        """
+        while not stop.is_set():
+            try:
+                chunk = self.file.read(self.chunk_size)
+            except READ_ERRORS as e:
+                chunk = e
+            while not stop.is_set():
+                try:
+                    chunks.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if not chunk or isinstance(chunk, READ_ERRORS):
+                return
 
 
 class ClientCLI:
@@ -17,7 +126,45 @@ class ClientCLI:
             client: An instance of the Client class.
         """
         self.client = client
-        self.fingerprint_public_key_map = {}
+
+        # Handler for each of the client's request types
+        self.request_handlers = {
+            "public_chat": self.handle_public_chat,
+            "chat": self.handle_chat,
+            "file_upload": self.handle_file_upload,
+            "file_download": self.handle_file_download,
+        }
+
+        # Shared HTTP session so file transfers reuse pooled keep-alive
+        # connections to the server, sized for the parallel download workers
+        self.http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.2),
+        )
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+    def close(self):
+        """
+        Closes the pooled HTTP connections used for file transfers.
+        """
+        self.http.close()
+
+    def read_index(self, prompt):
+        """
+        Prompts the user for a non-negative index.
+
+        Args:
+            prompt (str): The prompt to display.
+
+        Returns:
+            int: The entered index, or None if the input is not a valid index.
+        """
+        value = input(prompt).strip()
+        # isdigit also accepts characters such as superscripts that int rejects
+        return int(value) if value.isdecimal() else None
 
     def print_options(self):
         """
@@ -33,55 +180,42 @@ class ClientCLI:
         message = input("Enter the message: ")
         self.client.request.public_chat(message)
 
-    def update_fingerprint_map(self):
-        """
-        Updates the mapping between user fingerprints and their public keys.
-        """
-        self.fingerprint_public_key_map = {}
-        for public_key in self.client.user_list.keys():
-            fingerprint = get_fingerprint(public_key)
-            self.fingerprint_public_key_map[fingerprint] = public_key
-
     def handle_chat(self):
         """
         Handles sending a private chat message to selected users.
         """
-        self.update_fingerprint_map()
-        users = list(self.fingerprint_public_key_map.keys())
+        # The current user is left out so the displayed indices match the list
+        users = [
+            fingerprint
+            for fingerprint in self.client.public_keys
+            if fingerprint != self.client.fingerprint
+        ]
 
         # Ensure there are users to chat with
         if not users:
             print("No users available to chat.")
             return
 
-        # Get the current user's fingerprint to exclude from the list
-        current_user_fingerprint = get_fingerprint(
-            get_public_key(self.client.private_key)
-        )
-
         # Display users with their fingerprints
         print("Available users to chat with:")
         for index, user_fingerprint in enumerate(users):
-            if user_fingerprint == current_user_fingerprint:
-                continue
             print(f"{index}: {user_fingerprint}")
 
         # Get recipients from user input
         recipients_string = input(
             "Which users would you like to communicate with (comma-separated indices): "
         )
-        recipients_indices = [s.strip() for s in recipients_string.split(",")]
-        recipients = []
+        recipients_indices = [
+            int(i) for i in INDEX_PATTERN.findall(recipients_string)
+        ]
 
-        # Validate and collect recipient public keys
+        # Validate and collect recipient fingerprints, each selected once
         for i in recipients_indices:
-            try:
-                user_index = int(i)
-                user_fingerprint = users[user_index]
-                recipients.append(self.fingerprint_public_key_map[user_fingerprint])
-            except (ValueError, IndexError):
+            if i >= len(users):
                 print(f"Invalid user index: {i}")
-                continue
+        recipients = list(
+            dict.fromkeys(users[i] for i in recipients_indices if i < len(users))
+        )
 
         # If no valid recipients are selected
         if not recipients:
@@ -105,11 +239,13 @@ class ClientCLI:
                 # Define the endpoint URL
                 upload_url = f"http://{self.client.host}:{self.client.port}/api/upload"
 
-                # Create the file payload for the POST request
-                files = {"file": file}
+                # Stream the file as the multipart payload of the POST request
+                body = MultipartFileStream(file, "file")
 
                 # Send the file via POST request
-                response = requests.post(upload_url, files=files)
+                response = self.http.post(
+                    upload_url, data=body, headers={"Content-Type": body.content_type}
+                )
 
                 # Check the server's response
                 if response.status_code == 200:
@@ -137,7 +273,7 @@ class ClientCLI:
         """
         Handles downloading a file from the server.
         """
-        files = list(self.client.download_links.keys())
+        files = list(self.client.download_links)
 
         if not files:
             print("No files available for download.")
@@ -149,12 +285,11 @@ class ClientCLI:
             print(f"{index}: '{filename}'")
 
         # Get the file index from user input
-        try:
-            file_index = int(input("Which file would you like to download: "))
-            filename = files[file_index]
-        except (ValueError, IndexError):
+        file_index = self.read_index("Which file would you like to download: ")
+        if file_index is None or file_index >= len(files):
             print("Invalid file index.")
             return
+        filename = files[file_index]
 
         download_url = self.client.download_links[filename]
         save_path = input(
@@ -162,88 +297,190 @@ class ClientCLI:
         )
 
         try:
-            response = requests.get(download_url, stream=True)
+            downloaded = self.download_in_parts(download_url, save_path)
+        except DOWNLOAD_ERRORS as e:
+            print(f"An error occurred while downloading the file: {e}")
+            return
+        if downloaded:
+            print(f"File successfully downloaded and saved to {save_path}")
+            return
+
+        try:
+            response = self.http.get(download_url, stream=True)
             if response.status_code == 200:
+                # Read into one reused buffer rather than a new bytes per chunk
+                response.raw.decode_content = True
+                buffer = memoryview(bytearray(CHUNK_SIZE))
                 with open(save_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+                    while read := response.raw.readinto(buffer):
+                        f.write(buffer[:read])
                 print(f"File successfully downloaded and saved to {save_path}")
             else:
                 print(
                     f"Error: Failed to download file. Server responded with status code {response.status_code}."
                 )
-        except requests.exceptions.RequestException as e:
+        # Raw reads raise urllib3's errors, which requests does not wrap
+        except DOWNLOAD_ERRORS as e:
             print(f"An error occurred while downloading the file: {e}")
 
+    def download_in_parts(self, download_url, save_path):
+        """
+        Downloads a file as byte ranges fetched in parallel.
+
+        If any part fails, the partly written file is removed and the error
+        is raised.
+
+        Args:
+            download_url (str): The URL of the file to download.
+            save_path (str): The path where the file should be saved.
+
+        Returns:
+            bool: True if the file was downloaded, False if the server does not
+            support range requests, the file is too small to split, or the
+            platform lacks positional writes.
+        """
+        if not hasattr(os, "pwrite"):
+            return False
+
+        response = self.http.head(download_url)
+        if (
+            response.status_code != 200
+            or response.headers.get("Accept-Ranges") != "bytes"
+        ):
+            return False
+
+        file_size = int(response.headers.get("Content-Length", 0))
+        if file_size <= DOWNLOAD_PART_SIZE:
+            return False
+
+        ranges = [
+            (start, min(start + DOWNLOAD_PART_SIZE, file_size) - 1)
+            for start in range(0, file_size, DOWNLOAD_PART_SIZE)
+        ]
+        with open(save_path, "wb") as f:
+            try:
+                f.truncate(file_size)
+                with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+                    parts = [
+                        executor.submit(
+                            self.download_part, download_url, f.fileno(), *r
+                        )
+                        for r in ranges
+                    ]
+                    try:
+                        for part in parts:
+                            part.result()
+                    except DOWNLOAD_ERRORS:
+                        executor.shutdown(cancel_futures=True)
+                        raise
+            except DOWNLOAD_ERRORS:
+                # The file was sized up front, so a partial download would
+                # otherwise look complete
+                f.close()
+                os.remove(save_path)
+                raise
+        return True
+
+    def download_part(self, download_url, fd, start, end):
+        """
+        Downloads one byte range of a file and writes it at its offset.
+
+        Args:
+            download_url (str): The URL of the file to download.
+            fd (int): The descriptor of the destination file.
+            start (int): The first byte of the range.
+            end (int): The last byte of the range, inclusive.
+        """
+        response = self.http.get(
+            download_url, headers={"Range": f"bytes={start}-{end}"}, stream=True
+        )
+        if response.status_code != 206:
+            raise requests.exceptions.RequestException(
+                f"Server responded with status code {response.status_code} to a range request."
+            )
+        response.raw.decode_content = True
+        buffer = memoryview(bytearray(CHUNK_SIZE))
+        offset = start
+        while read := response.raw.readinto(buffer):
+            os.pwrite(fd, buffer[:read], offset)
+            offset += read
+        if offset != end + 1:
+            raise requests.exceptions.RequestException(
+                f"Download of bytes {start}-{end} ended early at byte {offset}."
+            )
+
     def print_users(self):
         """
         Pretty prints the fingerprint to public key mapping.
         """
-        self.update_fingerprint_map()
+        users = list(self.client.public_keys.items())
 
-        if not self.fingerprint_public_key_map:
+        if not users:
             print("No users available.")
             return
 
-        print("Available users (fingerprint -> public key):")
-        for fingerprint, public_key in self.fingerprint_public_key_map.items():
-            print(f"Fingerprint: {fingerprint}\nPublic Key: {public_key}\n")
+        # Rendered up front and printed in one call rather than per line
+        lines = ["Available users (fingerprint -> public key):"]
+        for fingerprint, public_key in users:
+            lines.append(f"Fingerprint: {fingerprint}\nPublic Key: {public_key}\n")
+        print("\n".join(lines))
 
     def print_messages(self):
         """
         Pretty prints the messages stored in the client's message buffer.
         """
-        if not self.client.message_buffer:
+        # Snapshot the buffer as messages are appended from the event thread
+        messages = list(self.client.message_buffer)
+        if not messages:
             print("No messages available.")
             return
 
-        print("Messages:")
-        for index, msg in enumerate(self.client.message_buffer):
+        # Rendered up front and printed in one call rather than per line
+        lines = ["Messages:"]
+        for index, msg in enumerate(messages):
             participants = ", ".join(msg.participants)
-            print(f"Message {index + 1}:")
-            print(f"  From: {msg.sender}")
-            print(f"  To: {participants}")
-            print(f"  Text: {msg.text}")
-            print("-" * 40)
+            lines.append(f"Message {index + 1}:")
+            lines.append(f"  From: {msg.sender}")
+            lines.append(f"  To: {participants}")
+            lines.append(f"  Text: {msg.text}")
+            lines.append("-" * 40)
+        print("\n".join(lines))
 
     def run(self):
         """Runs the client CLI, handling user input and invoking the appropriate methods."""
-        while True:
-            print("Select an option:")
-            print("0: View Messages")
-            print("1: Send Message")
-            print("2: List Users")
-            try:
-                index = int(input("Enter your choice: "))
-            except ValueError:
-                print("Invalid input. Please enter a number.")
-                continue
-
-            if index == 0:
-                self.print_messages()
-            elif index == 1:
-                self.print_options()
-                try:
-                    option_index = int(
-                        input("What kind of message do you want to send?: ")
+        try:
+            while True:
+                print("Select an option:")
+                print("0: View Messages")
+                print("1: Send Message")
+                print("2: List Users")
+                index = self.read_index("Enter your choice: ")
+                if index is None:
+                    print("Invalid input. Please enter a number.")
+                    continue
+
+                if index == 0:
+                    self.print_messages()
+                elif index == 1:
+                    self.print_options()
+                    option_index = self.read_index(
+                        "What kind of message do you want to send?: "
                     )
+                    if option_index is None or option_index >= len(
+                        self.client.request_types
+                    ):
+                        print("Invalid option selected.")
+                        continue
                     request_type = self.client.request_types[option_index]
-                except (ValueError, IndexError):
-                    print("Invalid option selected.")
-                    continue
 
-                if request_type == "public_chat":
-                    self.handle_public_chat()
-                elif request_type == "chat":
-                    self.handle_chat()
-                elif request_type == "file_upload":
-                    self.handle_file_upload()
-                elif request_type == "file_download":
-                    self.handle_file_download()
+                    handler = self.request_handlers.get(request_type)
+                    if handler:
+                        handler()
+                    else:
+                        print("Sorry, that isn't a valid option.")
+                elif index == 2:
+                    self.print_users()
                 else:
                     print("Sorry, that isn't a valid option.")
-            elif index == 2:
-                self.print_users()
-            else:
-                print("Sorry, that isn't a valid option.")
+        finally:
+            self.close()
@@ -11,20 +11,40 @@ Key functionalities:
 
 import base64
 import logging
-from collections import namedtuple
-from message_utils import is_valid_message, process_data, validate_signature
-from crypto_utils import (
+import queue
+from dataclasses import dataclass
+from libs.message_utils import (
+    is_valid_message,
+    parse_message,
+    process_data,
+    validate_signature,
+)
+from libs.crypto_utils import (
     decrypt_symm_key,
     decrypt_message,
     get_fingerprint,
-    get_public_key,
+    rsa_executor,
 )
 
-# Object to store processed messages on the client side
-Msg = namedtuple("Msg", ["text", "sender", "participants"])
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+@dataclass(slots=True, frozen=True)
+class Msg:
+    """A processed message stored on the client side."""
+
+    text: str
+    sender: str
+    participants: tuple
+
+
+# Number of recent message IDs remembered for duplicate detection
+MAX_PROCESSED_MESSAGE_IDS = 65536
+# Most queued messages decrypted and verified together by the worker
+MAX_MESSAGE_BATCH = 32
+# Participants shown for every public chat, shared by all of them
+PUBLIC_PARTICIPANTS = ("Public",)
+# Message types that carry a signed chat
+CHAT_MESSAGE_TYPES = frozenset({"chat", "public_chat", "signed_data"})
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,16 +64,34 @@ class Event:
             client: An instance of the Client class.
         """
         self.client = client
+        # Messages received on the socket thread, waiting to be decrypted
+        self.inbox = queue.SimpleQueue()
+        # Handler for each type of message received from the server
+        self.message_handlers = dict.fromkeys(CHAT_MESSAGE_TYPES, self.handle_chat)
+        # Handler for each type of signed chat data
+        self.chat_handlers = {
+            "public_chat": self.handle_public_chat,
+            "chat": self.handle_private_chat,
+        }
 
     def connect(self):
         """Handles successful connection to the server."""
         logger.info("Successfully connected to server")
-        self.client.response_event.set()
+        self.client.resolve_response("connect")
+
+        # A hello has already been sent, so this is an automatic reconnect and
+        # the server has forgotten this client. The cached hello data is signed
+        # again with a new counter, as replaying the old message would be
+        # rejected as a replay. Nothing waits on the replies this time
+        if self.client.request.hello_data is not None:
+            logger.info("Reconnected to server, resending hello")
+            self.client.request.hello(expect_response=False)
+            self.client.request.client_list_request(expect_response=False)
 
     def hello(self):
         """Handles acknowledgment of service request from the server."""
         logger.info("Server accepted the request for service")
-        self.client.response_event.set()
+        self.client.resolve_response("hello")
 
     def client_list(self, data):
         """
@@ -69,33 +107,113 @@ class Event:
 
         server_list = data.get("servers")
         if server_list:
-            self.client.user_list.clear()
-            for server in server_list:
-                for client_public_key in server.get("clients", []):
-                    self.client.user_list[client_public_key] = server["address"]
-        self.client.response_event.set()
+            # Only keys not seen in a previous update need to be hashed
+            known_fingerprints = {
+                key: fp for fp, key in self.client.public_keys.items()
+            }
+            users = [
+                (
+                    known_fingerprints.get(client_public_key)
+                    or get_fingerprint(client_public_key),
+                    client_public_key,
+                    server["address"],
+                )
+                for server in server_list
+                for client_public_key in server.get("clients", [])
+            ]
+            # The maps are rebuilt whole and swapped in, so the CLI thread
+            # never sees one partially updated. The two can still differ
+            # between the swaps, so readers must allow for a user missing
+            # from either
+            self.client.user_list = {fp: address for fp, _, address in users}
+            self.client.public_keys = {fp: key for fp, key, _ in users}
+        self.client.resolve_response("client_list")
 
     def message(self, msg):
         """
-        Processes incoming messages from the server.
+        Queues incoming messages from the server for processing.
+
+        Signature checks and decryption are slow, so they are left to the
+        process_messages worker and the socket thread returns immediately.
+
+        Args:
+            msg: The incoming message data.
+        """
+        self.inbox.put(msg)
+
+    def process_messages(self):
+        """
+        Worker loop that processes queued messages in the order received.
+
+        Messages queued together are decrypted and verified in parallel,
+        then stored one by one in the order received, so message counters
+        from each sender are still checked in order.
+        """
+        while True:
+            batch = [self.inbox.get()]
+            while len(batch) < MAX_MESSAGE_BATCH:
+                try:
+                    batch.append(self.inbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            pending = []
+            for msg in batch:
+                try:
+                    opened = self.open_message(msg)
+                except Exception as e:
+                    logger.error("Error processing message: %s", e)
+                    continue
+                if opened:
+                    pending.append(rsa_executor.submit(*opened))
+
+            for result in pending:
+                try:
+                    self.store_message(result.result())
+                except Exception as e:
+                    logger.error("Error processing message: %s", e)
+
+    def open_message(self, msg):
+        """
+        Parses an incoming message and selects how it is decrypted and verified.
 
         Args:
             msg: The incoming message data.
+
+        Returns:
+            tuple: The handler to decrypt and verify the message followed by
+            its arguments, or None if the message is dropped.
         """
-        processed_msg = process_data(msg)
-        if not processed_msg or not processed_msg.get("data"):
+        parsed = parse_message(msg)
+        if not parsed:
+            logger.warning("Ignoring invalid message")
+            return None
+
+        msg_type, processed_msg = parsed
+        if not processed_msg.get("data"):
             logger.warning("Ignoring message due to error in processing")
-            return
+            return None
 
-        msg_type = processed_msg.get("type")
-        if not is_valid_message(processed_msg, msg_type):
-            logger.warning(f"Invalid message received of type {msg_type}")
-            return
+        handler = self.message_handlers.get(msg_type)
+        if handler:
+            return handler(processed_msg)
+        logger.warning("Unknown message type received: %s", msg_type)
+        return None
 
-        if msg_type in {"chat", "public_chat", "signed_data"}:
-            self.handle_chat(processed_msg)
-        else:
-            logger.warning(f"Unknown message type received: {msg_type}")
+    def store_message(self, opened):
+        """
+        Stores a decrypted and verified message if its counter is current.
+
+        Args:
+            opened: The sender, counter and Msg returned by a chat handler,
+                or None if the message was dropped.
+        """
+        if opened is None:
+            return
+        sender_id, counter, msg_obj = opened
+        if not self.check_and_update_counter(sender_id, counter):
+            return
+        self.client.message_buffer.append(msg_obj)
 
     def handle_chat(self, msg):
         """
@@ -103,41 +221,67 @@ class Event:
 
         Args:
             msg: The chat message data.
+
+        Returns:
+            tuple: The handler to decrypt and verify the chat followed by its
+            arguments, or None if the message is dropped.
         """
         # Extract message ID to prevent duplicates
         msg_id = msg.get("id")
         if msg_id in self.client.processed_message_ids:
-            logger.info(f"Duplicate message {msg_id} received. Ignoring.")
-            return
-        self.client.processed_message_ids.add(msg_id)
+            logger.info("Duplicate message %s received. Ignoring.", msg_id)
+            return None
+        self.client.processed_message_ids[msg_id] = None
+        if len(self.client.processed_message_ids) > MAX_PROCESSED_MESSAGE_IDS:
+            self.client.processed_message_ids.popitem(last=False)
+
+        counter = int(msg.get("counter"))
+        sender_fingerprint = msg["data"].get("sender")
+
+        # A replayed or stale public chat is dropped before paying for an RSA
+        # verify. The counter is only recorded once the signature is checked
+        if sender_fingerprint is not None and counter <= (
+            self.client.user_counter_map.get(sender_fingerprint, -1)
+        ):
+            logger.debug("Received a message with an invalid or outdated counter")
+            return None
+
+        msg_type = msg["data"].get("type")
+        handler = self.chat_handlers.get(msg_type)
+        if handler:
+            return handler, msg, counter
+        logger.warning("Unknown message type received: %s", msg_type)
+        return None
+
+    def verify_signature(self, msg, sender_fingerprint):
+        """
+        Validates a message's signature against its sender's public key.
+
+        Args:
+            msg: The signed message.
+            sender_fingerprint: The fingerprint of the claimed sender.
+
+        Returns:
+            bool: True if the signature is valid, False otherwise.
+        """
+        # Only the named sender's key is tried. An unknown sender's key is not
+        # held, so any other key that verified would mean a forged sender
+        sender_public_key = self.client.public_keys.get(sender_fingerprint)
+        if not sender_public_key:
+            logger.warning("Received a message from an unknown sender, dropping message")
+            return False
 
-        # Validate the integrity of the message's signature
         if not validate_signature(
             msg.get("signature"),
             msg.get("data"),
             msg.get("counter"),
-            list(self.client.user_list.keys()),
+            [sender_public_key],
         ):
             logger.warning(
                 "Received a message with an invalid signature, dropping message"
             )
-            return
-
-        counter = int(msg.get("counter"))
-        msg_type = msg["data"].get("type")
-
-        if msg_type == "public_chat":
-            self.handle_public_chat(msg, counter)
-        elif msg_type == "chat":
-            # Optional: Check if the message is sent by self
-            sender_fingerprint = msg["data"].get("sender")
-            own_fingerprint = get_fingerprint(get_public_key(self.client.private_key))
-            if sender_fingerprint == own_fingerprint:
-                logger.info("Received own message back. Skipping processing.")
-                return
-            self.handle_private_chat(msg, counter)
-        else:
-            logger.warning(f"Unknown message type received: {msg_type}")
+            return False
+        return True
 
     def handle_public_chat(self, msg, counter):
         """
@@ -146,17 +290,21 @@ class Event:
         Args:
             msg: The chat message data.
             counter: The counter value from the message.
+
+        Returns:
+            tuple: The sender, counter and Msg to store, or None if the
+            signature is invalid.
         """
         sender_fingerprint = msg["data"]["sender"]
-        if not self.check_and_update_counter(sender_fingerprint, counter):
-            return
+        if not self.verify_signature(msg, sender_fingerprint):
+            return None
 
         msg_obj = Msg(
             text=msg["data"]["message"],
             sender=sender_fingerprint,
-            participants=["Public"],
+            participants=PUBLIC_PARTICIPANTS,
         )
-        self.client.message_buffer.append(msg_obj)
+        return sender_fingerprint, counter, msg_obj
 
     def handle_private_chat(self, msg, counter):
         """
@@ -165,55 +313,92 @@ class Event:
         Args:
             msg: The chat message data.
             counter: The counter value from the message.
+
+        Returns:
+            tuple: The sender, counter and Msg to store, or None if the chat
+            is not for this client or is invalid.
         """
         data = msg.get("data")
+
+        # Optional: Check if the message is sent by self
+        if data.get("sender") == self.client.fingerprint:
+            logger.info("Received own message back. Skipping processing.")
+            return None
+
+        # The sender is only known once decrypted, so the signature is
+        # checked after decryption
         encrypted_chat = data.get("chat")
         iv = data.get("iv")
         if not encrypted_chat or not iv:
             logger.warning("Invalid chat data or IV")
-            return
+            return None
 
+        symm_keys = data.get("symm_keys", [])
+        symm_key_fingerprints = data.get("symm_key_fingerprints")
+        if isinstance(symm_key_fingerprints, list):
+            # The sender tagged each symmetric key with its owner's fingerprint,
+            # so only our own key needs to be decrypted
+            try:
+                index = symm_key_fingerprints.index(self.client.fingerprint)
+            except ValueError:
+                logger.info("Chat message not addressed to this client")
+                return None
+            symm_keys = symm_keys[index : index + 1]
+        else:
+            # Without fingerprints, keys are in the same order as the
+            # destination servers, so keys routed to our server are tried first.
+            # The same server can be written as different addresses, so every
+            # key is still tried if none are routed to ours
+            destination_servers = data.get("destination_servers", [])
+            home_server = self.client.user_list.get(self.client.fingerprint)
+            if home_server is not None and len(symm_keys) == len(
+                destination_servers
+            ):
+                routed_symm_keys = [
+                    symm_key
+                    for symm_key, server in zip(symm_keys, destination_servers)
+                    if server == home_server
+                ]
+                symm_keys = routed_symm_keys or symm_keys
+
+        # Decoded once, however many symmetric keys are tried
+        encrypted_chat = base64.b64decode(encrypted_chat)
+        iv = base64.b64decode(iv)
         chat = None
-        for encrypted_symm_key in data.get("symm_keys", []):
+        for encrypted_symm_key in symm_keys:
             symm_key = decrypt_symm_key(encrypted_symm_key, self.client.private_key)
             if not symm_key:
                 continue
-            try:
-                decrypted_data = decrypt_message(
-                    symm_key, encrypted_chat, base64.b64decode(iv.encode("utf-8"))
-                )
-                if decrypted_data and isinstance(decrypted_data, dict):
-                    chat = decrypted_data.get("chat")
-                    break
-            except Exception as e:
-                logger.error(f"Error during decryption: {e}")
-                continue
+            decrypted_data = decrypt_message(symm_key, encrypted_chat, iv)
+            if decrypted_data and isinstance(decrypted_data, dict):
+                chat = decrypted_data.get("chat")
+                break
 
         if not chat:
             logger.warning("Invalid or missing chat segment")
-            return
+            return None
 
         # Ensure 'participants' and 'message' are present and correctly formatted
         if not isinstance(chat.get("participants"), list) or not isinstance(
             chat.get("message"), str
         ):
             logger.warning("Invalid chat segment structure")
-            return
+            return None
 
         if not is_valid_message(chat, "chat_segment"):
             logger.warning("Invalid or missing chat segment")
-            return
+            return None
 
         sender_id = chat["participants"][0]
-        if not self.check_and_update_counter(sender_id, counter):
-            return
+        if not self.verify_signature(msg, sender_id):
+            return None
 
         msg_obj = Msg(
             text=chat["message"],
             sender=sender_id,
-            participants=chat["participants"][1:],
+            participants=tuple(chat["participants"][1:]),
         )
-        self.client.message_buffer.append(msg_obj)
+        return sender_id, counter, msg_obj
 
     def check_and_update_counter(self, sender_id, counter):
         """
@@ -226,9 +411,9 @@ class Event:
         Returns:
             bool: True if the counter is valid and updated, False otherwise.
         """
-        sender_prev_counter = self.client.user_counter_map.get(sender_id)
-        if sender_prev_counter is not None and counter <= sender_prev_counter:
-            logger.warning("Received a message with an invalid or outdated counter")
+        # Counters start at 0, so an unseen sender accepts any valid counter
+        if counter <= self.client.user_counter_map.get(sender_id, -1):
+            logger.debug("Received a message with an invalid or outdated counter")
             return False
         self.client.user_counter_map[sender_id] = counter
         return True
@@ -10,9 +10,16 @@ The 'data' field of a 'signed_data' message can have the following types:
 - 'public_chat': A broadcasted message.
 """
 
-from message_utils import make_signed_data_msg
-from crypto_utils import get_public_key, get_fingerprint
-from crypto_utils import generate_key, encrypt_message, encrypt_symm_keys
+import logging
+from libs.message_utils import make_signed_data_msg
+from libs.crypto_utils import generate_key, encrypt_message, encrypt_symm_keys
+
+# The client list request carries no per-client data, so a single
+# instance is reused for every request
+CLIENT_LIST_REQUEST = {"type": "client_list_request"}
+
+logger = logging.getLogger(__name__)
+
 
 class Request:
     """
@@ -30,50 +37,68 @@ class Request:
             client: An instance of the Client class.
         """
         self.client = client
+        # Hello data only depends on the client's public key, so it is built
+        # once and reused for every hello sent this session
+        self.hello_data = None
+        # Public chat data differs only by message, so one dict is reused. It
+        # is serialised as soon as it is signed, so refilling it is safe
+        self.public_chat_data = None
 
     def connect(self):
         """
         Connects the client to the server.
         """
-        print("Attempting to connect to server")
+        logger.info("Attempting to connect to server")
 
+        connected = self.client.expect_response("connect")
         try:
             self.client.socket_io.connect(f"ws://{self.client.host}:{self.client.port}", transports=['websocket'])
-            self.client.response_event.wait()
+            connected.result()
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
 
-    def hello(self):
+    def hello(self, expect_response=True):
         """
         Sends a hello message to the server to establish service agreement.
+
+        Args:
+            expect_response (bool): Whether the server's reply will be awaited.
+
+        Returns:
+            Future: Completed when the server accepts the hello, or None if
+            the reply is not awaited.
         """
-        hello_data = {
-            "type": "hello",
-            "public_key": get_public_key(
-                self.client.private_key
-            ),  # Normal client key transmission
-        }
+        if self.hello_data is None:
+            self.hello_data = {
+                "type": "hello",
+                "public_key": self.client.public_key,  # Normal client key transmission
+            }
         signed_hello_msg = make_signed_data_msg(
-            hello_data, str(self.client.nonce), self.client.private_key
+            self.hello_data, self.client.next_counter(), self.client.private_key
         )
-        self.client.nonce += 1
-        print("Requesting service from server")
+        logger.info("Requesting service from server")
+        response = self.client.expect_response("hello") if expect_response else None
         self.client.socket_io.emit("hello", signed_hello_msg)
-        self.client.response_event.clear()
-        self.client.response_event.wait()
+        return response
 
-    def client_list_request(self):
+    def client_list_request(self, expect_response=True):
         """
         Requests the client list from the server.
+
+        Args:
+            expect_response (bool): Whether the server's reply will be awaited.
+
+        Returns:
+            Future: Completed when the client list is received, or None if
+            the reply is not awaited.
         """
-        print("Requesting client list from server")
+        logger.info("Requesting client list from server")
 
-        self.client.socket_io.emit(
-            "client_list_request", {"type": "client_list_request"}
+        response = (
+            self.client.expect_response("client_list") if expect_response else None
         )
-
-        self.client.response_event.clear()
-        self.client.response_event.wait()
+        self.client.socket_io.emit("client_list_request", CLIENT_LIST_REQUEST)
+        return response
 
     def public_chat(self, message_text):
         """
@@ -82,18 +107,18 @@ class Request:
         Args:
             message_text (str): The message to be sent in the public chat.
         """
-        fingerprint = get_fingerprint(get_public_key(self.client.private_key))
-        public_chat_data = {
-            "type": "public_chat",
-            "sender": fingerprint,
-            "message": str(message_text),  # Standard public message format
-        }
+        if self.public_chat_data is None:
+            self.public_chat_data = {
+                "type": "public_chat",
+                "sender": self.client.fingerprint,
+                "message": None,
+            }
+        self.public_chat_data["message"] = str(message_text)  # Standard public message format
         public_chat_msg = make_signed_data_msg(
-            public_chat_data, str(self.client.nonce), self.client.private_key
+            self.public_chat_data, self.client.next_counter(), self.client.private_key
         )
-        self.client.nonce += 1
 
-        print("Sending public chat")
+        logger.info("Sending public chat")
         self.client.socket_io.emit("message", public_chat_msg)
 
     def chat(self, message_txt, *recipients):
@@ -102,13 +127,28 @@ class Request:
 
         Args:
             message_txt (str): The message to be sent.
-            recipients (tuple): A variable number of recipients for the chat message.
+            recipients (tuple): Fingerprints of a variable number of recipients for the chat message.
         """
-        sender_fingerprint = get_fingerprint(get_public_key(self.client.private_key))
-        participants_list = [sender_fingerprint]
-        for recipient in recipients:
-            fingerprint = get_fingerprint(recipient)
-            participants_list.append(fingerprint)
+        # Both maps are read once, as a client list update can replace them
+        # while the chat is built. Recipients who have since left are skipped
+        public_keys = self.client.public_keys
+        user_list = self.client.user_list
+        missing = [
+            recipient
+            for recipient in recipients
+            if recipient not in public_keys or recipient not in user_list
+        ]
+        if missing:
+            logger.warning("Skipping recipients no longer online: %s", missing)
+            recipients = [
+                recipient for recipient in recipients if recipient not in missing
+            ]
+            if not recipients:
+                logger.warning("No recipients left, chat not sent")
+                return
+
+        participants_list = [self.client.fingerprint, *recipients]
+        recipient_public_keys = [public_keys[recipient] for recipient in recipients]
 
         chat = {
             "chat": {
@@ -122,29 +162,26 @@ class Request:
         encrypted_message = encryption_data["message"]  # Already base64
         iv = encryption_data["iv"]  # Already base64
 
-        # Retrieve the sender's public key
-        sender_public_key = get_public_key(self.client.private_key)
-
         # Include the sender's public key in the encrypted symmetric keys
         encrypted_symm_keys = encrypt_symm_keys(
-            symm_key, sender_public_key, *recipients
+            symm_key, self.client.public_key, *recipient_public_keys
         )
 
-        destination_server_list = [
-            self.client.user_list[recipient] for recipient in recipients
-        ]
+        destination_server_list = [user_list[recipient] for recipient in recipients]
 
         data = {
             "type": "chat",
             "destination_servers": destination_server_list,
             "iv": iv,
             "symm_keys": encrypted_symm_keys,
+            # Fingerprint of the owner of each symmetric key, in the same
+            # order, so recipients can pick out their key without trial decrypts
+            "symm_key_fingerprints": participants_list,
             "chat": encrypted_message,  # Encrypted private message sent
         }
 
         chat_message = make_signed_data_msg(
-            data, str(self.client.nonce), self.client.private_key
+            data, self.client.next_counter(), self.client.private_key
         )
-        self.client.nonce += 1
-        print("Sending chat")
+        logger.info("Sending chat")
         self.client.socket_io.emit("message", chat_message)
@@ -0,0 +1,4 @@
+"""
+Shared utilities used by both the Client and Server implementations of the
+OLAF-Neighbourhood protocol.
+"""
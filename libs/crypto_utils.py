@@ -9,12 +9,32 @@ import base64
 import json
 import os
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric import rsa, padding as rsa_padding
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# Padding and digest objects are immutable, so one instance of each is
+# shared by every RSA operation rather than rebuilt per call
+SHA256 = hashes.SHA256()
+# RSA-OAEP padding used for every symmetric key
+OAEP_PADDING = rsa_padding.OAEP(
+    mgf=rsa_padding.MGF1(algorithm=SHA256),
+    algorithm=SHA256,
+    label=None,
+)
+# RSA-PSS padding used for signing and verifying messages
+PSS_PADDING = rsa_padding.PSS(
+    mgf=rsa_padding.MGF1(SHA256),
+    salt_length=rsa_padding.PSS.MAX_LENGTH,
+)
+
+# Shared pool for RSA operations on several keys at once. OpenSSL releases
+# the GIL while it works, so the operations run in parallel
+rsa_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
 
 
 # Generate private key for client
@@ -55,16 +75,17 @@ def get_fingerprint(public_key):
     Returns:
         A base64-encoded fingerprint of the public key.
     """
-    sha256_hash = hashlib.sha256()
-    sha256_hash.update(public_key.encode("utf-8"))
-    binary_fingerprint = sha256_hash.digest()
-    base64_fingerprint = base64.b64encode(binary_fingerprint).decode("utf-8")
-    return base64_fingerprint
+    binary_fingerprint = hashlib.sha256(public_key.encode("utf-8")).digest()
+    return base64.b64encode(binary_fingerprint).decode("utf-8")
 
 
+@lru_cache(maxsize=1024)
 def base64_to_pem(pem_string):
     """Convert a base64-encoded PEM string back to a public key object.
 
+    Parsed keys are cached, so a user's key is only loaded once however many
+    messages are exchanged with them.
+
     Args:
         pem_string: A base64-encoded string of the PEM public key.
 
@@ -98,21 +119,16 @@ def decrypt_symm_key(encoded_encrypted_symm_key, private_key):
 
     Args:
         encoded_encrypted_symm_key: The base64-encoded encrypted symmetric key.
-        private_key: The private key used for decryption.
+        private_key: The RSA private key object used for decryption. Pass the
+            object returned by generate_private_key rather than reloading it
+            from PEM, so OpenSSL keeps reusing its precomputed CRT parameters.
 
     Returns:
         The decrypted symmetric key.
     """
     encrypted_symm_key = base64.b64decode(encoded_encrypted_symm_key)
     try:
-        symm_key = private_key.decrypt(
-            encrypted_symm_key,
-            rsa_padding.OAEP(
-                mgf=rsa_padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None,
-            ),
-        )
+        symm_key = private_key.decrypt(encrypted_symm_key, OAEP_PADDING)
     except ValueError:
         return None
 
@@ -124,32 +140,27 @@ def decrypt_message(decrypted_symm_key, message, iv):
 
     Args:
         decrypted_symm_key: The symmetric key used for decryption.
-        message: The base64-encoded encrypted message (which includes the authentication tag).
-        iv: The base64-encoded initialization vector used during encryption.
+        message: The encrypted message bytes (which include the authentication tag).
+        iv: The initialization vector bytes used during encryption.
 
     Returns:
         The decrypted message as a JSON object, or None if decryption fails.
     """
-    # Decode the base64-encoded message and IV from utf-8 strings
-    message = base64.b64decode(
-        message.encode("utf-8")
-    )  # Convert to bytes first, then decode from base64
-
-    # Initialize AES GCM for decryption
-    aesgcm = AESGCM(decrypted_symm_key)
-
     try:
-        # Decrypt the message. AESGCM automatically handles authentication tag verification.
-        decrypted_data = aesgcm.decrypt(iv, message, None)
+        # Decrypt the message. AESGCM automatically handles authentication tag
+        # verification, so a wrong key fails here without parsing anything
+        decrypted_data = AESGCM(decrypted_symm_key).decrypt(iv, message, None)
+    except (InvalidTag, ValueError):
+        # Return None if the tag is invalid or the key or IV is malformed
+        return None
 
+    try:
         # Convert decrypted bytes to JSON object
-        data = json.loads(decrypted_data.decode("utf-8"))
-    except (json.JSONDecodeError, InvalidTag):
-        # Return None if decryption fails due to invalid tag or JSON parsing issues
+        return json.loads(decrypted_data)
+    except ValueError:
+        # Return None if the authenticated plaintext is not valid JSON
         return None
 
-    return data
-
 
 def encrypt_message(key, message):
     """Encrypt a message using the provided symmetric key.
@@ -183,33 +194,36 @@ def generate_key():
     return os.urandom(16)
 
 
+def encrypt_symm_key(symm_key, recipient):
+    """Encrypt a symmetric key for one recipient using their public key.
+
+    Args:
+        symm_key: The symmetric key to encrypt (should be in bytes).
+        recipient: Base64-encoded UTF-8 string of the public key.
+
+    Returns:
+        The base64-encoded encrypted symmetric key.
+    """
+    public_key = base64_to_pem(recipient)
+    ciphertext = public_key.encrypt(symm_key, OAEP_PADDING)
+    return base64.b64encode(ciphertext).decode("utf-8")
+
+
 def encrypt_symm_keys(symm_key, *recipients):
     """Encrypt a symmetric key for multiple recipients using their public keys.
 
+    The keys are encrypted in parallel when there is more than one recipient.
+
     Args:
         symm_key: The symmetric key to encrypt (should be in bytes).
         recipients: Base64-encoded UTF-8 strings of public keys.
 
     Returns:
-        A list of base64-encoded encrypted symmetric keys.
+        A list of base64-encoded encrypted symmetric keys, in recipient order.
     """
-    encrypted_symm_keys = []
-    for recipient in recipients:
-        # Decode the base64-encoded public key
-        decoded_key = base64.b64decode(recipient.encode("utf-8"))
-        public_key = serialization.load_pem_public_key(
-            decoded_key, backend=default_backend()
-        )
-        ciphertext = public_key.encrypt(
-            symm_key,
-            rsa_padding.OAEP(
-                mgf=rsa_padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None,
-            ),
-        )
-        encrypted_symm_keys.append(base64.b64encode(ciphertext).decode("utf-8"))
-    return encrypted_symm_keys
+    if len(recipients) <= 1:
+        return [encrypt_symm_key(symm_key, recipient) for recipient in recipients]
+    return list(rsa_executor.map(partial(encrypt_symm_key, symm_key), recipients))
 
 
 def sign_data(private_key, data):
@@ -222,11 +236,4 @@ def sign_data(private_key, data):
     Returns:
         A signature generated using the private key.
     """
-    return private_key.sign(
-        data,
-        rsa_padding.PSS(
-            mgf=rsa_padding.MGF1(hashes.SHA256()),
-            salt_length=rsa_padding.PSS.MAX_LENGTH,
-        ),
-        hashes.SHA256(),
-    )
+    return private_key.sign(data, PSS_PADDING, SHA256)
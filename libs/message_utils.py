@@ -9,14 +9,26 @@ while others focus on message formatting for transmission.
 import base64
 import json
 import hashlib
-from crypto_utils import sign_data
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import hashes
+import os
+import threading
+from .crypto_utils import PSS_PADDING, SHA256, sign_data
 from cryptography.exceptions import InvalidSignature
-from crypto_utils import base64_to_pem
+from .crypto_utils import base64_to_pem
 
 import uuid  # Added import for generating unique message IDs
 
+# Random bytes for message IDs are read from the OS in bulk rather than
+# once per message, and handed out 16 bytes at a time
+MESSAGE_ID_POOL_SIZE = 4096
+message_id_pool = bytearray()
+message_id_lock = threading.Lock()
+
+# Layout of a signed_data message, filled with the JSON of the id, the
+# already serialised data, the counter and the signature, in that order
+SIGNED_DATA_TEMPLATE = (
+    '{"type":"signed_data","id":%s,"data":%s,"counter":%s,"signature":%s}'
+)
+
 # Required fields for each message type
 fields = {
     "signed_data": ["type", "id", "data", "counter", "signature"],  # Added 'id'
@@ -32,23 +44,63 @@ fields = {
 }
 
 
-def create_signature(msg_data, counter, private_key):
+def make_validator(required_fields):
+    """
+    Builds a validator that checks a message has the given required fields.
+
+    Args:
+        required_fields (list): The fields the message must contain.
+
+    Returns:
+        function: Returns True if a message is a dictionary with every field.
+    """
+    required_fields = frozenset(required_fields)
+
+    def validate(msg):
+        # A single set comparison against the dict's key view checks every field
+        return isinstance(msg, dict) and msg.keys() >= required_fields
+
+    return validate
+
+
+# Validator for each message type, built once when the module is loaded
+validators = {
+    msg_type: make_validator(required_fields)
+    for msg_type, required_fields in fields.items()
+}
+
+
+def serialise_message(msg):
+    """
+    Serialises an outgoing message envelope to compact JSON.
+
+    Only the envelope is compacted, the signed 'data' is re-serialised by
+    receivers with json.dumps defaults, so signatures are unaffected.
+
+    Args:
+        msg (dict): The message to serialise.
+
+    Returns:
+        str: The message as a JSON string without insignificant whitespace.
+    """
+    return json.dumps(msg, separators=(",", ":"))
+
+
+def sign_data_json(msg_data_json, counter, private_key):
     """
-    Creates a base64-encoded SHA-256 signature for the given message data and counter.
+    Creates a base64-encoded SHA-256 signature for serialised message data and a counter.
 
     This function ensures that the messages sent have verifiable integrity
     and haven't been tampered with during transmission.
 
     Args:
-        msg_data (dict): The message data to be signed.
+        msg_data_json (str): The message data as serialised by json.dumps.
         counter (str): A counter value to include in the signature.
         private_key: The RSA private key object.
 
     Returns:
         str: A base64-encoded signature.
     """
-    msg_data_json = json.dumps(msg_data)
-
     # Concatenate the message data and counter for signing
     msg_data_counter = msg_data_json + counter
 
@@ -84,20 +136,15 @@ def validate_signature(signature, data, counter, public_keys):
     # Iterate over each public key and try to verify the signature
     for public_key_pem in public_keys:
         try:
-            # Convert the base64-encoded public key to PEM format and load it
+            # Load the base64-encoded PEM public key, cached after first use
             public_key = base64_to_pem(public_key_pem)
 
             # Verify the RSA-PSS signature using the public key
             public_key.verify(
                 signature_bytes,  # Signature should be in bytes
                 msg_data_counter,  # Data should also be in bytes
-                padding.PSS(
-                    mgf=padding.MGF1(
-                        hashes.SHA256()
-                    ),  # Mask generation function (MGF1 with SHA-256)
-                    salt_length=padding.PSS.MAX_LENGTH,  # Use PSS.MAX_LENGTH to match the signing process
-                ),
-                hashes.SHA256(),  # SHA-256 digest algorithm
+                PSS_PADDING,  # Same padding as the signing process
+                SHA256,  # SHA-256 digest algorithm
             )
             # If no exception is raised, the signature is valid
             return True
@@ -109,6 +156,21 @@ def validate_signature(signature, data, counter, public_keys):
     return False
 
 
+def next_message_id():
+    """
+    Generates a unique message ID from the pool of random bytes.
+
+    Returns:
+        str: A random ID in the same format as str(uuid.uuid4()).
+    """
+    with message_id_lock:
+        if len(message_id_pool) < 16:
+            message_id_pool.extend(os.urandom(MESSAGE_ID_POOL_SIZE))
+        id_bytes = bytes(message_id_pool[:16])
+        del message_id_pool[:16]
+    return str(uuid.UUID(bytes=id_bytes, version=4))
+
+
 def make_signed_data_msg(msg_data, counter, private_key):
     """
     Creates a signed data message in JSON format with a unique ID.
@@ -124,16 +186,18 @@ def make_signed_data_msg(msg_data, counter, private_key):
     Returns:
         str: A JSON-formatted signed data message.
     """
-    signature = create_signature(msg_data, counter, private_key)
-    msg_id = str(uuid.uuid4())  # Generate a unique message ID
-    msg = {
-        "type": "signed_data",
-        "id": msg_id,  # Add the unique ID
-        "data": msg_data,
-        "counter": counter,
-        "signature": signature,
-    }
-    return json.dumps(msg)
+    # The data is serialised once, both for signing and as the envelope's
+    # data field. It keeps json.dumps defaults so it matches what receivers
+    # re-serialise when verifying
+    msg_data_json = json.dumps(msg_data)
+    signature = sign_data_json(msg_data_json, counter, private_key)
+    msg_id = next_message_id()  # Generate a unique message ID
+    return SIGNED_DATA_TEMPLATE % (
+        json.dumps(msg_id),
+        msg_data_json,
+        json.dumps(counter),
+        json.dumps(signature),
+    )
 
 
 def is_valid_message(msg, msg_type):
@@ -148,15 +212,11 @@ def is_valid_message(msg, msg_type):
         msg_type (str): The type of the message.
 
     Returns:
-        bool: True if the message is valid, False otherwise.
+        bool: True if the message is valid, False otherwise, including when
+        the type is unknown.
     """
-
-    required_fields = fields[msg_type]
-    for field in required_fields:
-        if field not in msg:
-            return False
-
-    return True
+    validator = validators.get(msg_type)
+    return validator is not None and validator(msg)
 
 
 def process_data(data):
@@ -178,3 +238,32 @@ def process_data(data):
         return data
     else:
         print("Unknown data type received")
+
+
+def parse_message(data):
+    """
+    Parses raw message data and validates it against its declared type.
+
+    Combines process_data and is_valid_message so that receivers decode,
+    look up the type and check required fields in a single call.
+
+    Args:
+        data (str or dict): The raw message data to parse.
+
+    Returns:
+        tuple: The message type and the message as a dictionary, or None if
+        the message could not be parsed or is invalid for its type.
+    """
+    try:
+        msg = process_data(data)
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(msg, dict):
+        return None
+
+    msg_type = msg.get("type")
+    if not is_valid_message(msg, msg_type):
+        return None
+
+    return msg_type, msg
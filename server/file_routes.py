@@ -1,6 +1,6 @@
 import os
 import uuid
-from flask import Blueprint, request, jsonify, abort
+from flask import Blueprint, request, jsonify, abort, send_from_directory
 
 # Create a blueprint for your routes
 routes_bp = Blueprint("routes_bp", __name__)
@@ -58,9 +58,9 @@ def get_file(filename):
     if not os.path.exists(file_path):
         return jsonify({"error": "File not found"}), 404
 
-    # return the file contents bytes
-    bytes = open(file_path, "rb").read()
-    return bytes
+    # Stream the file from disk, send_from_directory also serves Range
+    # requests so clients can fetch parts of the file in parallel
+    return send_from_directory(os.path.abspath(UPLOAD_FOLDER), filename)
 
 
 # Error handling for large files
@@ -1,16 +1,16 @@
 import logging
 import sys
 import os
-import json
 import re
 
-sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "libs")))
+# The shared libs package sits beside this directory in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import argparse
 import socketio
 from flask import Flask
 from flask_socketio import SocketIO
-from message_utils import make_signed_data_msg
-from crypto_utils import generate_private_key
+from libs.message_utils import make_signed_data_msg, serialise_message
+from libs.crypto_utils import generate_private_key
 from server_events import ServerEvent
 from socketio.exceptions import (
     ConnectionError as ConnectionErrorSocketIO,
@@ -41,10 +41,10 @@ class Server:
         nonce: Counter for unique message identification.
         user_nonce_map: Mapping of user nonces.
         user_list: List of connected users.
-        client_list: List of connected clients.
+        client_list: Map of connected client sids to base64 PEM public keys.
     """
 
-    server_list = ["127.0.0.1:4567", "127.0.0.1:9002"]
+    server_list = ("127.0.0.1:4567", "127.0.0.1:9002")
 
     def __init__(self, port):
         """Initializes the Server with the given host and port.
@@ -155,21 +155,21 @@ class Server:
             "sender": f"{self.host}:{self.port}",
         }
 
-        for server_ip in list(self.connected_servers.keys()):
+        for server_ip, client_socket in self.connected_servers.items():
             server_hello = make_signed_data_msg(
                 server_hello_data, str(self.nonce), self.private_key
             )
             self.nonce += 1
             logger.info(f"Sending hello message to {server_ip}")
-            self.connected_servers[server_ip].send(server_hello)
+            client_socket.send(server_hello)
 
         # Request for client list from each connected server
         client_list_request = {"type": "client_update_request"}
 
-        client_list_request = json.dumps(client_list_request)
-        for server_ip in list(self.connected_servers.keys()):
+        client_list_request = serialise_message(client_list_request)
+        for server_ip, client_socket in self.connected_servers.items():
             logger.info(f"Sending client list request to {server_ip}")
-            self.connected_servers[server_ip].send(client_list_request)
+            client_socket.send(client_list_request)
 
         # Indicate server startup success
         logger.info(f"Server {self.host}:{self.port} startup success")
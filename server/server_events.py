@@ -6,15 +6,19 @@ connections, disconnections, and message processing for clients and servers
 communicating within a networked environment.
 """
 
-import json
 from socketio.exceptions import (
     ConnectionError as ConnectionErrorSocketIO,
     SocketIOError,
 )
 from flask import request
 from flask_socketio import emit, join_room
-from message_utils import is_valid_message, process_data, make_signed_data_msg
-from crypto_utils import base64_to_pem, pem_to_base64
+from libs.message_utils import (
+    is_valid_message,
+    process_data,
+    make_signed_data_msg,
+    serialise_message,
+)
+from libs.crypto_utils import base64_to_pem, pem_to_base64
 
 class ServerEvent:
     """Handles server events for managing connections and messaging."""
@@ -73,11 +77,12 @@ class ServerEvent:
         data = processed_data["data"]
         public_key = data["public_key"]
 
-        # Normal clients are added to the server's local list
-        self.server.client_list[sid] = base64_to_pem(public_key)
+        # Normal clients are added to the server's local list. The key is
+        # exported in its canonical form once here, not on every client update
+        self.server.client_list[sid] = pem_to_base64(base64_to_pem(public_key))
 
         # Add this client to the global users list
-        client_pub_key = pem_to_base64(self.server.client_list[sid])
+        client_pub_key = self.server.client_list[sid]
         self.server.user_list[client_pub_key] = (
             f"{self.server.host}:{self.server.port}"
         )
@@ -90,18 +95,13 @@ class ServerEvent:
     def client_update_notification(self):
         """Notify connected servers and clients of an update to the client list."""
     
-        client_list = [
-            (
-                pem_to_base64(self.server.client_list[sid])
-            )
-            for sid in list(self.server.client_list.keys())
-        ]
+        client_list = list(self.server.client_list.values())
 
         client_update = {"type": "client_update", "clients": client_list}
-        client_update_json = json.dumps(client_update)
+        client_update_json = serialise_message(client_update)
 
-        for ip_address in list(self.server.connected_servers.keys()):
-            socket = self.server.connected_servers[ip_address]
+        # Copied as a disconnect may remove a server while sending
+        for socket in list(self.server.connected_servers.values()):
             socket.send(client_update_json)
 
         print("Sent client update to all servers")
@@ -118,7 +118,7 @@ class ServerEvent:
             ],
         }
 
-        client_list_json = json.dumps(client_list)
+        client_list_json = serialise_message(client_list)
         emit("client_list", client_list_json, room="client")
         print("Sent client update to all clients")
 
@@ -155,7 +155,7 @@ class ServerEvent:
             ],
         }
 
-        client_list_json = json.dumps(client_list)
+        client_list_json = serialise_message(client_list)
         emit("client_list", client_list_json, room=sid)
 
     def message(self, msg):
@@ -166,20 +166,19 @@ class ServerEvent:
         """
         print("A message has been received")
         processed_msg = process_data(msg)
+        msg_type = processed_msg.get("type") if isinstance(processed_msg, dict) else None
 
-        if not is_valid_message(processed_msg, processed_msg["type"]):
-            print(f"Invalid message received of type {processed_msg['type']}")
+        # Unknown or missing types fail validation rather than raising
+        if not is_valid_message(processed_msg, msg_type):
+            print(f"Invalid message received of type {msg_type}")
             return
 
-        msg_type = None
-        if processed_msg["type"] == "signed_data":
+        if msg_type == "signed_data":
             data = processed_msg["data"]
-            msg_type = data["type"]
+            msg_type = data.get("type") if isinstance(data, dict) else None
             if not is_valid_message(data, msg_type):
                 print(f"Invalid message received of type {msg_type}")
                 return
-        else:
-            msg_type = processed_msg["type"]
 
         if msg_type == "chat":
             self.chat(processed_msg)
@@ -257,7 +256,7 @@ class ServerEvent:
             ],
         }
 
-        client_list_json = json.dumps(client_list)
+        client_list_json = serialise_message(client_list)
         emit("client_list", client_list_json, room="client")
 
         # print(f"New User List: {self.server.user_list}")
@@ -285,12 +284,9 @@ class ServerEvent:
         print(f"Client update request received from server: {ip_address}")
 
         # Create and send the client_update message
-        clients = [
-            pem_to_base64(self.server.client_list[sid])
-            for sid in self.server.client_list
-        ]
+        clients = list(self.server.client_list.values())
         client_update = {"type": "client_update", "clients": clients}
-        client_update_json = json.dumps(client_update)
+        client_update_json = serialise_message(client_update)
 
         socket = self.server.connected_servers[ip_address]
         socket.send(client_update_json)
@@ -369,7 +365,7 @@ class ServerEvent:
 
                 # Request for client list
                 client_update_request = {"type": "client_update_request"}
-                client_update_request = json.dumps(client_update_request)
+                client_update_request = serialise_message(client_update_request)
                 print(f"Sending client update request to {server_ip}")
                 client_socket.send(client_update_request)
 